@@ -3,40 +3,221 @@ Text extraction utilities for PDFs and images
 Supports OCR via EasyOCR (no installation required)
 """
 
-import easyocr
+import hashlib
+import logging
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
 from PIL import Image
 import os
-import platform
-import tempfile
+import threading
 
-# Initialize OCR reader (will download model on first use)
-try:
-    reader = easyocr.Reader(['en'], gpu=False)
-except Exception as e:
-    print(f"[WARNING] EasyOCR initialization failed: {e}")
-    reader = None
+from .cache import LRUCache
 
+log = logging.getLogger(__name__)
 
-def extract_text_from_pdf(pdf_path: str) -> str:
+
+def _use_gpu() -> bool:
+    """Use CUDA when available; EASYOCR_GPU=0/1 forces the choice"""
+    override = os.environ.get('EASYOCR_GPU')
+    if override is not None:
+        return override.strip().lower() in ('1', 'true', 'yes', 'on')
+    try:
+        import torch
+        return torch.cuda.is_available()
+    except Exception:
+        return False
+
+
+def _available_cpus() -> int:
+    """CPUs this process may run on; unlike os.cpu_count() this honours affinity masks"""
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        # sched_getaffinity isn't available on Windows/macOS
+        return os.cpu_count() or 1
+
+
+# torch intra-op threads for CPU inference; half the cores leaves room for Uvicorn workers
+TORCH_THREADS = max(1, int(os.environ.get('TORCH_THREADS', _available_cpus() // 2)))
+
+
+def _configure_torch_threads(num_threads: int) -> None:
+    """Pin torch CPU threading to avoid oversubscription under multiple workers"""
+    try:
+        import torch
+        torch.set_num_threads(num_threads)
+        torch.set_num_interop_threads(1)
+    except Exception as e:
+        # set_num_interop_threads fails once torch has started parallel work
+        log.warning("Could not configure torch threads: %s", e)
+
+
+# OCR reader, created on first use by get_reader() (downloads the model if needed)
+_reader = None
+_reader_initialized = False
+_reader_lock = threading.Lock()
+
+
+def get_reader(torch_threads: int = None):
     """
-    Extract text from PDF file
+    Return the shared EasyOCR reader, loading it on first call
     
-    Converts PDF pages to images using pdf2image (requires Poppler). Each page is
-    OCR'd with EasyOCR and combined. If `pdf2image` or Poppler isn't available
-    the function raises an informative exception with install instructions.
+    Thread-safe; returns None if EasyOCR could not be initialized.
     
     Args:
-        pdf_path: Path to the PDF file
-        
-    Returns:
-        Extracted text as string
+        torch_threads: torch CPU threads to load the model with
+            (defaults to TORCH_THREADS; only used on the loading call)
+    """
+    global _reader, _reader_initialized
+    
+    if not _reader_initialized:
+        with _reader_lock:
+            if not _reader_initialized:
+                try:
+                    import easyocr
+                    gpu = _use_gpu()
+                    if not gpu:
+                        _configure_torch_threads(torch_threads or TORCH_THREADS)
+                    # On CPU, quantize=True applies int8 dynamic quantization
+                    # to the recognizer's Linear/LSTM layers
+                    _reader = easyocr.Reader(['en'], gpu=gpu, quantize=True)
+                except Exception as e:
+                    log.warning("EasyOCR initialization failed: %s", e)
+                    _reader = None
+                _reader_initialized = True
+    
+    return _reader
+
+
+def preload_reader() -> None:
+    """
+    Load the reader in a pre-fork master (e.g. `gunicorn --preload`)
+    
+    Workers forked afterwards share the model weights copy-on-write instead
+    of each loading their own copy. Skipped on GPU, since CUDA state can't
+    be inherited across fork; workers then load the reader themselves.
+    
+    The model is loaded with a single torch thread so no OpenMP thread pool
+    exists in the master at fork time; each worker sets its own thread count
+    in gunicorn.conf.py's post_fork hook.
+    """
+    if os.environ.get('EASYOCR_GPU') is None:
+        # torch.cuda.is_available() normally runs cuInit, which would leave every
+        # forked worker unable to use CUDA; the NVML probe doesn't touch CUDA
+        os.environ.setdefault('PYTORCH_NVML_BASED_CUDA_CHECK', '1')
+    if _use_gpu():
+        log.info("Skipping OCR preload: GPU readers are loaded per worker")
+        return
+    get_reader(torch_threads=1)
+
+
+def warm_up_reader() -> None:
+    """
+    Load the reader if needed and run a tiny inference
+    
+    Called once per worker process so CUDA/kernel setup isn't paid by the
+    first request.
+    """
+    reader = get_reader()
+    if reader is not None:
+        reader.readtext(np.zeros((32, 32, 3), dtype=np.uint8))
+
+
+# Maximum number of PDF pages OCR'd concurrently (further capped by cores on CPU)
+PDF_OCR_WORKERS = 4
+
+# Pages whose embedded text is longer than this skip OCR entirely
+MIN_TEXT_LAYER_CHARS = 20
+
+# PDF rasterization DPI; raise PDF_DPI for small print at the cost of latency
+PDF_DPI = int(os.environ.get('PDF_DPI', 150))
+
+
+# Upper bound on the long side EasyOCR's text detector works at for image uploads;
+# its default of 2560 upsamples typical screenshots and the detector cost scales
+# with pixel count. PDF pages are detected at their rendered size, set by PDF_DPI.
+OCR_CANVAS_SIZE = 1280
+
+
+def _readtext(reader, arr: np.ndarray, max_canvas_size: int = None) -> str:
+    """
+    Run EasyOCR on a pixel array and join the recognized lines
+    
+    The detector never upsamples; max_canvas_size additionally caps the long side.
+    """
+    canvas_size = max(arr.shape[:2])
+    if max_canvas_size:
+        canvas_size = min(canvas_size, max_canvas_size)
+    # detail=0 returns plain strings rather than (box, text, confidence) tuples
+    lines = reader.readtext(arr, canvas_size=canvas_size, mag_ratio=1.0, detail=0, batch_size=8)
+    return '\n'.join(lines)
+
+
+# OCR text of rendered PDF pages keyed by pixel hash, so repeated pages skip the recognizer
+PAGE_CACHE_SIZE = 256
+_page_cache = LRUCache(PAGE_CACHE_SIZE)
+
+
+def _pdf_ocr_workers(reader, num_pages: int) -> int:
+    """Thread pool size for PDF page OCR that keeps CPU inference within the available cores"""
+    workers = PDF_OCR_WORKERS
+    if getattr(reader, 'device', 'cpu') == 'cpu':
+        # Every pool thread runs torch with TORCH_THREADS intra-op threads of its own
+        workers = min(workers, max(1, _available_cpus() // TORCH_THREADS))
+    return min(workers, num_pages)
+
+
+def _ocr_page(arr: np.ndarray) -> str:
+    """OCR a single rendered PDF page straight from its decoded pixel buffer"""
+    hasher = hashlib.blake2b(digest_size=16)
+    hasher.update(repr(arr.shape).encode())
+    hasher.update(arr.tobytes())
+    key = hasher.digest()
+    
+    page_text = _page_cache.get(key)
+    if page_text is None:
+        # Pages are rendered in grayscale; EasyOCR accepts single-channel arrays
+        page_text = _readtext(get_reader(), arr)
+        _page_cache.put(key, page_text)
+    return page_text
+
+
+def _load_pages_pymupdf(pymupdf, pdf_path: str) -> list:
+    """
+    Load PDF pages in-process with PyMuPDF
+    
+    Pages with an embedded text layer are returned as their text; the rest
+    are rendered to grayscale arrays for OCR. No subprocess or intermediate
+    image files are involved.
+    """
+    pages = []
+    with pymupdf.open(pdf_path) as doc:
+        for page in doc:
+            text = page.get_text("text")
+            if len(text.strip()) > MIN_TEXT_LAYER_CHARS:
+                pages.append(text.strip())
+                continue
+            
+            pix = page.get_pixmap(dpi=PDF_DPI, colorspace=pymupdf.csGRAY)
+            arr = np.frombuffer(pix.samples, dtype=np.uint8).reshape(pix.height, pix.width)
+            pages.append(arr)
+    return pages
+
+
+def _render_pages_pdf2image(pdf_path: str) -> list:
+    """
+    Render PDF pages to grayscale arrays with pdf2image (requires Poppler)
+    
+    If `pdf2image` or Poppler isn't available the function raises an
+    informative exception with install instructions.
     """
     # Try to import pdf2image here so the main app can run without it for image-only use
     try:
         from pdf2image import convert_from_path
     except Exception as e:
         raise Exception(
-            "PDF extraction requires the Python package 'pdf2image' and the Poppler binaries.\n"
+            "PDF extraction requires either PyMuPDF (pip install pymupdf) or the Python\n"
+            "package 'pdf2image' and the Poppler binaries.\n"
             "Install pdf2image: pip install pdf2image\n"
             "Install Poppler (Windows): https://blog.alivate.com.au/poppler-windows/ (add to PATH)\n"
             "Or (Linux) apt-get install poppler-utils\n"
@@ -46,11 +227,17 @@ def extract_text_from_pdf(pdf_path: str) -> str:
     # Convert PDF pages to images
     try:
         # If Poppler is installed in a custom location on Windows, set POPPLER_PATH env var
+        # PPM is uncompressed, so Poppler skips the PNG encode/decode entirely
+        convert_kwargs = {
+            'dpi': PDF_DPI,
+            'fmt': 'ppm',
+            'grayscale': True,
+            'thread_count': _available_cpus(),
+        }
         poppler_path = os.environ.get('POPPLER_PATH')
         if poppler_path:
-            pages = convert_from_path(pdf_path, dpi=200, fmt='png', poppler_path=poppler_path)
-        else:
-            pages = convert_from_path(pdf_path, dpi=200, fmt='png')
+            convert_kwargs['poppler_path'] = poppler_path
+        pages = convert_from_path(pdf_path, **convert_kwargs)
     except Exception as e:
         raise Exception(
             "Failed to convert PDF to images. Ensure Poppler is installed and accessible.\n"
@@ -58,25 +245,51 @@ def extract_text_from_pdf(pdf_path: str) -> str:
             f"Original error: {e}"
         )
 
-    # OCR each page and combine text
-    texts = []
-    for i, page in enumerate(pages):
-        tmp = None
+    return [np.asarray(page) for page in pages]
+
+
+def extract_text_from_pdf(pdf_path: str) -> str:
+    """
+    Extract text from PDF file
+    
+    Reads pages with PyMuPDF, falling back to pdf2image (requires Poppler)
+    when PyMuPDF isn't installed. Pages with an embedded text layer use it
+    directly; the rest are OCR'd with EasyOCR in parallel worker threads.
+    
+    Args:
+        pdf_path: Path to the PDF file
+        
+    Returns:
+        Extracted text as string
+    """
+    try:
+        import pymupdf
+    except ImportError:
+        pymupdf = None
+
+    if pymupdf is not None:
         try:
-            tmp = tempfile.NamedTemporaryFile(suffix=f'_page{i}.png', delete=False)
-            page.save(tmp.name, format='PNG')
-            tmp.close()
-
-            # Use the image extractor (EasyOCR)
-            page_text = extract_text_from_image(tmp.name)
-            if page_text and page_text.strip():
-                texts.append(page_text)
-        finally:
-            if tmp is not None:
-                try:
-                    os.unlink(tmp.name)
-                except Exception:
-                    pass
+            pages = _load_pages_pymupdf(pymupdf, pdf_path)
+        except Exception as e:
+            raise Exception(f"Failed to render PDF pages with PyMuPDF. Original error: {e}")
+    else:
+        pages = _render_pages_pdf2image(pdf_path)
+
+    # Only pages without a usable text layer are still images and need OCR
+    ocr_indices = [i for i, page in enumerate(pages) if not isinstance(page, str)]
+    if ocr_indices:
+        reader = get_reader()
+        if reader is None:
+            raise Exception("EasyOCR not initialized. Please reinstall easyocr: pip install easyocr")
+
+        # OCR pages concurrently; torch releases the GIL during inference
+        with ThreadPoolExecutor(max_workers=_pdf_ocr_workers(reader, len(ocr_indices))) as executor:
+            ocr_texts = executor.map(_ocr_page, [pages[i] for i in ocr_indices])
+            for i, page_text in zip(ocr_indices, ocr_texts):
+                pages[i] = page_text
+
+    # Combine text per page
+    texts = [page_text for page_text in pages if page_text.strip()]
 
     if not texts:
         raise Exception("No text extracted from PDF pages")
@@ -84,52 +297,37 @@ def extract_text_from_pdf(pdf_path: str) -> str:
     return "\n\n--- Page Break ---\n\n".join(texts)
 
 
-def extract_text_from_image(image_path: str) -> str:
+def extract_text_from_image(image) -> str:
     """
     Extract text from image file using EasyOCR
     
     Supports: JPG, PNG, GIF, BMP, TIFF
     
+    The image is decoded once and the pixel array is passed straight to
+    EasyOCR, so no temporary file or second decode is needed.
+    
     Args:
-        image_path: Path to the image file
+        image: Path to the image file, or a binary file object positioned at its start
         
     Returns:
         Extracted text as string
     """
-    global reader
-    
+    reader = get_reader()
     if reader is None:
         raise Exception("EasyOCR not initialized. Please reinstall easyocr: pip install easyocr")
     
     try:
-        print(f"[DEBUG] Opening image: {image_path}")
-        img = Image.open(image_path)
-        print(f"[DEBUG] Image mode: {img.mode}, Size: {img.size}")
-        
-        # Convert to RGB if needed
-        if img.mode != 'RGB':
-            img = img.convert('RGB')
-        
-        # Apply contrast enhancement for better OCR
-        from PIL import ImageEnhance
-        enhancer = ImageEnhance.Contrast(img)
-        img = enhancer.enhance(1.5)
-        
-        # Perform OCR using EasyOCR
-        print(f"[DEBUG] Starting EasyOCR...")
-        results = reader.readtext(image_path)
-        
-        # Extract text from results
-        extracted_text = '\n'.join([text[1] for text in results])
-        print(f"[DEBUG] OCR completed. Text length: {len(extracted_text)}")
-        print(f"[DEBUG] Extracted text (first 200 chars): {extracted_text[:200]}")
+        img = Image.open(image)
+        log.debug("OCR image %s mode=%s size=%s", getattr(image, 'name', image), img.mode, img.size)
+
+        # EasyOCR treats 3-channel arrays as OpenCV-style BGR, so flip PIL's RGB
+        bgr = np.ascontiguousarray(np.asarray(img.convert('RGB'))[..., ::-1])
+        extracted_text = _readtext(reader, bgr, max_canvas_size=OCR_CANVAS_SIZE)
+        log.debug("OCR completed, %d chars: %.200s", len(extracted_text), extracted_text)
         
         return extracted_text.strip() if extracted_text else "No text found in image"
     
     except Exception as e:
-        print(f"[ERROR] Exception in extract_text_from_image: {str(e)}")
-        import traceback
-        traceback.print_exc()
         raise Exception(f"Error extracting text from image: {str(e)}")
 
 
@@ -6,19 +6,56 @@ Extracts text from PDFs and images, provides engagement suggestions
 from fastapi import FastAPI, UploadFile, File, HTTPException
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
-from fastapi.responses import HTMLResponse, JSONResponse
+from fastapi.responses import HTMLResponse, JSONResponse, Response
 from fastapi.requests import Request
+import asyncio
 import os
+import re
+import hashlib
+import logging
+import orjson
 import tempfile
+from contextlib import asynccontextmanager
 from pathlib import Path
 
-from .extractors import extract_text_from_pdf, extract_text_from_image
+from .cache import LRUCache
+from .extractors import (
+    extract_text_from_pdf,
+    extract_text_from_image,
+    preload_reader,
+    warm_up_reader,
+)
+
+# Log level is controlled by LOG_LEVEL (e.g. DEBUG for per-request OCR details)
+logging.basicConfig(level=os.environ.get("LOG_LEVEL", "WARNING").upper())
+log = logging.getLogger(__name__)
+
+# Under `gunicorn --preload` (see gunicorn.conf.py) load the OCR model once in the
+# master so forked workers share it
+if os.environ.get("PRELOAD_OCR") == "1":
+    preload_reader()
+
+
+def _log_warm_up_failure(future) -> None:
+    """Report a failed background OCR warm-up instead of dropping the exception"""
+    if not future.cancelled() and future.exception() is not None:
+        log.error("OCR warm-up failed", exc_info=future.exception())
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Load and warm the OCR model in the background so startup isn't blocked"""
+    warm_up = asyncio.get_running_loop().run_in_executor(None, warm_up_reader)
+    warm_up.add_done_callback(_log_warm_up_failure)
+    yield
+
 
 # Initialize FastAPI app
 app = FastAPI(
     title="Social Media Content Analyzer",
     description="Extract text from PDFs and images with OCR support",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # Setup directories
@@ -36,6 +73,36 @@ templates = Jinja2Templates(directory=str(TEMPLATE_DIR))
 # Allowed file extensions
 ALLOWED_EXTENSIONS = {".pdf", ".jpg", ".jpeg", ".png", ".gif", ".bmp", ".tiff"}
 MAX_FILE_SIZE = 50 * 1024 * 1024  # 50 MB
+UPLOAD_CHUNK_SIZE = 1024 * 1024  # 1 MB
+
+# Leading bytes of each supported format, mapped to the extension used for dispatch
+FILE_SIGNATURES = (
+    (b"%PDF-", ".pdf"),
+    (b"\xff\xd8\xff", ".jpg"),
+    (b"\x89PNG\r\n\x1a\n", ".png"),
+    (b"GIF87a", ".gif"),
+    (b"GIF89a", ".gif"),
+    (b"BM", ".bmp"),
+    (b"II*\x00", ".tiff"),
+    (b"MM\x00*", ".tiff"),
+)
+
+# "BM" alone is too weak a signature, so BMPs must also carry a known DIB header size
+BMP_DIB_HEADER_SIZES = {12, 40, 52, 56, 64, 108, 124}
+
+
+# (extracted_text, suggestions) keyed by upload content hash; texts longer than
+# RESULT_CACHE_MAX_CHARS aren't cached, so memory stays bounded by size x max chars
+RESULT_CACHE_SIZE = 128
+RESULT_CACHE_MAX_CHARS = 256 * 1024
+_result_cache = LRUCache(RESULT_CACHE_SIZE)
+
+
+# Engagement signals, matched as substrings in a single pass each
+_CTA_WORDS = frozenset({"please", "share", "comment", "follow", "subscribe"})
+_EMOJIS = frozenset({"😀", "❤️", "👍", "🎉", "✨"})
+_CTA_RE = re.compile("|".join(map(re.escape, sorted(_CTA_WORDS))), re.IGNORECASE)
+_EMOJI_RE = re.compile("|".join(map(re.escape, sorted(_EMOJIS))))
 
 
 def get_engagement_suggestions(text: str) -> list:
@@ -44,7 +111,6 @@ def get_engagement_suggestions(text: str) -> list:
     """
     suggestions = []
     
-    text_lower = text.lower()
     word_count = len(text.split())
     
     # Analyze content and provide suggestions
@@ -58,12 +124,12 @@ def get_engagement_suggestions(text: str) -> list:
     else:
         suggestions.append("❓ Consider adding a question to prompt comments")
     
-    if any(word in text_lower for word in ["please", "share", "comment", "follow", "subscribe"]):
+    if _CTA_RE.search(text):
         suggestions.append("📢 Strong CTA detected - great for driving engagement!")
     else:
         suggestions.append("📢 Add a clear call-to-action (CTA) to guide your audience")
     
-    if any(emoji in text for emoji in ["😀", "❤️", "👍", "🎉", "✨"]):
+    if _EMOJI_RE.search(text):
         suggestions.append("😊 Emojis detected - great for visual interest!")
     else:
         suggestions.append("😊 Consider adding emojis to make content more visually appealing")
@@ -76,6 +142,117 @@ def get_engagement_suggestions(text: str) -> list:
     return suggestions
 
 
+def _sniff_file_type(file: UploadFile):
+    """
+    Detect an upload's format from its leading bytes
+    
+    Returns:
+        Extension of the detected format, or None if unrecognized
+    """
+    header = file.file.read(18)
+    file.file.seek(0)
+    for signature, file_ext in FILE_SIGNATURES:
+        if not header.startswith(signature):
+            continue
+        if file_ext == ".bmp" and int.from_bytes(header[14:18], "little") not in BMP_DIB_HEADER_SIZES:
+            continue
+        return file_ext
+    return None
+
+
+def _iter_upload(file: UploadFile):
+    """
+    Yield an upload in chunks, raising 413 as soon as it grows past MAX_FILE_SIZE
+    """
+    size = 0
+    while True:
+        chunk = file.file.read(UPLOAD_CHUNK_SIZE)
+        if not chunk:
+            break
+        size += len(chunk)
+        if size > MAX_FILE_SIZE:
+            raise HTTPException(
+                status_code=413,
+                detail=f"File too large. Maximum size: {MAX_FILE_SIZE / 1024 / 1024:.0f}MB"
+            )
+        yield chunk
+
+
+def _save_upload(file: UploadFile, suffix: str) -> str:
+    """
+    Stream an upload into a temporary file
+    
+    Returns:
+        Temporary file path
+    """
+    with tempfile.NamedTemporaryFile(suffix=suffix, delete=False) as tmp:
+        tmp_path = tmp.name
+        try:
+            for chunk in _iter_upload(file):
+                tmp.write(chunk)
+        except BaseException:
+            tmp.close()
+            try:
+                os.unlink(tmp_path)
+            except:
+                pass
+            raise
+    
+    return tmp_path
+
+
+def _hash_upload(file: UploadFile) -> str:
+    """
+    Hash and size-check an upload in place, then rewind it for decoding
+    
+    Returns:
+        Hex content digest
+    """
+    hasher = hashlib.blake2b(digest_size=16)
+    for chunk in _iter_upload(file):
+        hasher.update(chunk)
+    file.file.seek(0)
+    
+    return hasher.hexdigest()
+
+
+def _extract_upload(source, file_ext: str) -> str:
+    """
+    Run the matching extractor on an upload
+    
+    Args:
+        source: Path to the saved PDF, or the uploaded image's file object
+        file_ext: Extension detected by _sniff_file_type
+    """
+    if file_ext == ".pdf":
+        try:
+            extracted_text = extract_text_from_pdf(source)
+        except Exception as e:
+            log.warning("PDF extraction failed", exc_info=True)
+            raise HTTPException(
+                status_code=422,
+                detail=f"PDF extraction error: {str(e)}. Try using images instead."
+            )
+    
+    else:
+        try:
+            extracted_text = extract_text_from_image(source)
+        except Exception as e:
+            log.warning("Image extraction failed", exc_info=True)
+            # Check if it's a Tesseract error
+            if "pytesseract" in str(e).lower() or "tesseract" in str(e).lower():
+                raise HTTPException(
+                    status_code=500,
+                    detail="Tesseract OCR not installed. Please install: https://github.com/UB-Mannheim/tesseract/wiki"
+                )
+            raise HTTPException(
+                status_code=422,
+                detail=f"Image extraction error: {str(e)}"
+            )
+    
+    return extracted_text
+
+
 @app.get("/", response_class=HTMLResponse)
 async def index(request: Request):
     """Serve the main UI page"""
@@ -102,84 +279,69 @@ async def extract_content(file: UploadFile = File(...)):
                 detail=f"File type not allowed. Supported: {', '.join(ALLOWED_EXTENSIONS)}"
             )
         
-        # Validate file size
-        contents = await file.read()
-        if len(contents) > MAX_FILE_SIZE:
+        # Reject content that isn't really a supported format before any I/O or OCR,
+        # and dispatch on the detected format rather than the filename
+        file_ext = _sniff_file_type(file)
+        if file_ext is None:
             raise HTTPException(
-                status_code=413,
-                detail=f"File too large. Maximum size: {MAX_FILE_SIZE / 1024 / 1024:.0f}MB"
+                status_code=415,
+                detail="File content is not a valid PDF or supported image."
             )
         
-        # Extract text based on file type
-        if file_ext == ".pdf":
-            # Create temporary file for PDF
-            with tempfile.NamedTemporaryFile(suffix=".pdf", delete=False) as tmp:
-                tmp.write(contents)
-                tmp_path = tmp.name
+        # Serve repeated uploads of identical content from the cache, hashing
+        # the spooled upload in place before anything is written to disk
+        cache_key = f"{file_ext}:{_hash_upload(file)}"
+        cached = _result_cache.get(cache_key)
+        
+        if cached is None:
+            # The PDF extractor opens a path (PyMuPDF, or pdf2image as a fallback), so
+            # PDFs are streamed to a temp file; images are decoded straight from the
+            # upload's own spooled file, without another copy
+            if file_ext == ".pdf":
+                source = _save_upload(file, file_ext)
+            else:
+                source = file.file
             
             try:
-                extracted_text = extract_text_from_pdf(tmp_path)
-            except Exception as e:
-                raise HTTPException(
-                    status_code=422,
-                    detail=f"PDF extraction error: {str(e)}. Try using images instead."
-                )
+                # Extract text based on file type
+                extracted_text = _extract_upload(source, file_ext)
             finally:
-                try:
-                    os.unlink(tmp_path)
-                except:
-                    pass
-        
-        elif file_ext in {".jpg", ".jpeg", ".png", ".gif", ".bmp", ".tiff"}:
-            # Create temporary file for image
-            with tempfile.NamedTemporaryFile(suffix=file_ext, delete=False) as tmp:
-                tmp.write(contents)
-                tmp_path = tmp.name
+                if file_ext == ".pdf":
+                    try:
+                        os.unlink(source)
+                    except:
+                        pass
             
-            try:
-                extracted_text = extract_text_from_image(tmp_path)
-            except Exception as e:
-                # Check if it's a Tesseract error
-                if "pytesseract" in str(e).lower() or "tesseract" in str(e).lower():
-                    raise HTTPException(
-                        status_code=500,
-                        detail="Tesseract OCR not installed. Please install: https://github.com/UB-Mannheim/tesseract/wiki"
-                    )
+            if not extracted_text or extracted_text.strip() == "":
                 raise HTTPException(
                     status_code=422,
-                    detail=f"Image extraction error: {str(e)}"
+                    detail="No text could be extracted from the file. Try a clearer image or different file."
                 )
-            finally:
-                try:
-                    os.unlink(tmp_path)
-                except:
-                    pass
-        
+            
+            # Generate engagement suggestions
+            suggestions = get_engagement_suggestions(extracted_text)
+            if len(extracted_text) <= RESULT_CACHE_MAX_CHARS:
+                _result_cache.put(cache_key, (extracted_text, suggestions))
         else:
-            raise HTTPException(status_code=400, detail="Unsupported file type")
+            extracted_text, suggestions = cached
         
-        if not extracted_text or extracted_text.strip() == "":
-            raise HTTPException(
-                status_code=422,
-                detail="No text could be extracted from the file. Try a clearer image or different file."
-            )
-        
-        # Generate engagement suggestions
-        suggestions = get_engagement_suggestions(extracted_text)
-        
-        return JSONResponse({
-            "success": True,
-            "filename": file.filename,
-            "extracted_text": extracted_text,
-            "suggestions": suggestions,
-            "text_length": len(extracted_text),
-            "word_count": len(extracted_text.split())
-        })
+        # orjson encodes long OCR text in C, straight to bytes
+        return Response(
+            content=orjson.dumps({
+                "success": True,
+                "filename": file.filename,
+                "extracted_text": extracted_text,
+                "suggestions": suggestions,
+                "text_length": len(extracted_text),
+                "word_count": len(extracted_text.split())
+            }),
+            media_type="application/json"
+        )
     
     except HTTPException as e:
         raise e
     except Exception as e:
-        print(f"ERROR in /extract: {str(e)}")
+        log.exception("Unhandled error in /extract")
         raise HTTPException(
             status_code=500,
             detail=f"Error processing file: {str(e)}"
@@ -0,0 +1,29 @@
+"""
+Gunicorn settings
+
+Preloads the app so the EasyOCR model is loaded once in the master and
+shared copy-on-write by the forked Uvicorn workers.
+"""
+
+import os
+import sys
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '8000')}"
+workers = int(os.environ.get('WEB_CONCURRENCY', 1))
+worker_class = "uvicorn.workers.UvicornWorker"
+timeout = 120
+
+preload_app = True
+
+# Read by app.main at import time, which happens in the master under preload_app
+os.environ.setdefault("PRELOAD_OCR", "1")
+
+
+def post_fork(server, worker):
+    """Give each worker its torch CPU threads; the master loaded the model single-threaded"""
+    torch = sys.modules.get("torch")
+    if torch is None:
+        # Nothing was preloaded; the worker configures torch when it loads the reader
+        return
+    from app.extractors import TORCH_THREADS
+    torch.set_num_threads(TORCH_THREADS)
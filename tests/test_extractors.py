@@ -0,0 +1,91 @@
+"""Tests for PDF and image text extraction, with a stub OCR reader"""
+
+import io
+
+import pymupdf
+import pytest
+from PIL import Image
+
+from app import extractors
+from app.cache import LRUCache
+
+
+class StubReader:
+    """Stands in for easyocr.Reader and records what it was asked to read"""
+
+    device = "cpu"
+
+    def __init__(self):
+        self.calls = []
+
+    def readtext(self, arr, **kwargs):
+        self.calls.append((arr, kwargs))
+        return ["scanned page"]
+
+
+@pytest.fixture
+def reader(monkeypatch):
+    stub = StubReader()
+    monkeypatch.setattr(extractors, "_reader", stub)
+    monkeypatch.setattr(extractors, "_reader_initialized", True)
+    monkeypatch.setattr(extractors, "_page_cache", LRUCache(extractors.PAGE_CACHE_SIZE))
+    return stub
+
+
+def _pdf(tmp_path, page_texts):
+    """Write a PDF with one page per entry; None leaves the page blank (no text layer)"""
+    path = tmp_path / "doc.pdf"
+    with pymupdf.open() as doc:
+        for text in page_texts:
+            page = doc.new_page()
+            if text is not None:
+                page.insert_text((72, 72), text)
+        doc.save(str(path))
+    return str(path)
+
+
+def test_pdf_uses_text_layer_and_ocrs_the_rest_in_page_order(tmp_path, reader):
+    pdf_path = _pdf(tmp_path, [
+        "First page has a real embedded text layer",
+        None,
+        "Third page has a real embedded text layer",
+    ])
+
+    text = extractors.extract_text_from_pdf(pdf_path)
+
+    assert text.split("\n\n--- Page Break ---\n\n") == [
+        "First page has a real embedded text layer",
+        "scanned page",
+        "Third page has a real embedded text layer",
+    ]
+    # Only the blank page reached the recognizer, as a grayscale render
+    assert len(reader.calls) == 1
+    arr, kwargs = reader.calls[0]
+    assert arr.ndim == 2
+    # PDF pages are detected at their rendered size, not the image upload cap
+    assert kwargs["canvas_size"] == max(arr.shape) > extractors.OCR_CANVAS_SIZE
+
+
+def test_pdf_with_only_text_layers_skips_ocr(tmp_path, reader):
+    pdf_path = _pdf(tmp_path, ["Only page has a real embedded text layer"])
+
+    assert extractors.extract_text_from_pdf(pdf_path) == "Only page has a real embedded text layer"
+    assert reader.calls == []
+
+
+def test_identical_scanned_pages_are_ocrd_once(tmp_path, reader):
+    pdf_path = _pdf(tmp_path, [None, None])
+
+    assert extractors.extract_text_from_pdf(pdf_path).count("scanned page") == 2
+    assert len(reader.calls) == 1
+
+
+def test_image_is_passed_to_easyocr_as_bgr(reader):
+    buf = io.BytesIO()
+    Image.new("RGB", (8, 8), (255, 0, 0)).save(buf, format="PNG")
+    buf.seek(0)
+
+    assert extractors.extract_text_from_image(buf) == "scanned page"
+    arr, kwargs = reader.calls[0]
+    assert arr[0, 0].tolist() == [0, 0, 255]
+    assert kwargs["canvas_size"] == 8
@@ -0,0 +1,130 @@
+"""Tests for the /extract endpoint, its upload helpers and engagement suggestions"""
+
+import io
+import struct
+from types import SimpleNamespace
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app import main
+from app.cache import LRUCache
+from app.main import _iter_upload, _sniff_file_type, get_engagement_suggestions
+
+
+def _upload(data: bytes):
+    return SimpleNamespace(file=io.BytesIO(data))
+
+
+def _bmp_header(dib_size: int) -> bytes:
+    # BITMAPFILEHEADER (14 bytes) followed by the DIB header size field
+    return b"BM" + struct.pack("<IHHI", 1000, 0, 0, 14 + dib_size) + struct.pack("<I", dib_size)
+
+
+@pytest.mark.parametrize("data, expected", [
+    (b"%PDF-1.7\n%\xe2\xe3\xcf\xd3\n", ".pdf"),
+    (b"\xff\xd8\xff\xe0\x00\x10JFIF\x00", ".jpg"),
+    (b"\x89PNG\r\n\x1a\n\x00\x00\x00\rIHDR", ".png"),
+    (b"GIF87a\x01\x00\x01\x00", ".gif"),
+    (b"GIF89a\x01\x00\x01\x00", ".gif"),
+    (b"II*\x00\x08\x00\x00\x00", ".tiff"),
+    (b"MM\x00*\x00\x00\x00\x08", ".tiff"),
+    (_bmp_header(40), ".bmp"),
+    (_bmp_header(124), ".bmp"),
+])
+def test_detects_supported_formats(data, expected):
+    assert _sniff_file_type(_upload(data + b"\x00" * 32)) == expected
+
+
+@pytest.mark.parametrize("data", [
+    b"",
+    b"hello world, not an image",
+    b"PK\x03\x04",
+    # Text that merely starts with "BM" must not pass as a bitmap
+    b"BMW owners club newsletter",
+    _bmp_header(41),
+])
+def test_rejects_unrecognized_content(data):
+    assert _sniff_file_type(_upload(data)) is None
+
+
+def test_rewinds_upload_after_sniffing():
+    upload = _upload(b"%PDF-1.4 rest of file")
+    _sniff_file_type(upload)
+    assert upload.file.tell() == 0
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(main, "_result_cache", LRUCache(main.RESULT_CACHE_SIZE))
+    return TestClient(main.app)
+
+
+@pytest.fixture
+def pdf_calls(monkeypatch):
+    """Replace the PDF extractor, recording each path it is called with"""
+    calls = []
+
+    def extract(pdf_path):
+        calls.append(pdf_path)
+        return "Extracted text. Please share!"
+
+    monkeypatch.setattr(main, "extract_text_from_pdf", extract)
+    return calls
+
+
+def test_repeated_upload_is_served_from_result_cache(client, pdf_calls):
+    upload = {"file": ("post.pdf", b"%PDF-1.4 same content", "application/pdf")}
+
+    first = client.post("/extract", files=upload)
+    second = client.post("/extract", files=upload)
+
+    assert first.status_code == second.status_code == 200
+    assert first.json() == second.json()
+    assert len(pdf_calls) == 1
+
+
+def test_oversized_upload_is_rejected_before_extraction(client, pdf_calls, monkeypatch):
+    monkeypatch.setattr(main, "MAX_FILE_SIZE", 1024)
+    monkeypatch.setattr(main, "UPLOAD_CHUNK_SIZE", 256)
+
+    response = client.post("/extract", files={"file": ("big.pdf", b"%PDF-1.4" + b"\x00" * 2048, "application/pdf")})
+
+    assert response.status_code == 413
+    assert pdf_calls == []
+
+
+def test_iter_upload_stops_reading_once_over_the_limit(monkeypatch):
+    monkeypatch.setattr(main, "MAX_FILE_SIZE", 1024)
+    monkeypatch.setattr(main, "UPLOAD_CHUNK_SIZE", 256)
+    upload = _upload(b"\x00" * 4096)
+
+    with pytest.raises(main.HTTPException) as excinfo:
+        for _ in _iter_upload(upload):
+            pass
+
+    assert excinfo.value.status_code == 413
+    # The chunk that crossed the limit is the last one read
+    assert upload.file.tell() == 1024 + 256
+
+
+@pytest.mark.parametrize("text, detected", [
+    ("Please like this post", True),
+    ("SUBSCRIBE for more", True),
+    ("Don't forget to Comment below", True),
+    ("Nothing to see here", False),
+])
+def test_detects_call_to_action(text, detected):
+    suggestions = get_engagement_suggestions(text)
+    assert ("📢 Strong CTA detected - great for driving engagement!" in suggestions) is detected
+
+
+@pytest.mark.parametrize("text, detected", [
+    ("Launch day 🎉", True),
+    ("We ❤️ our users", True),
+    ("Thumbs up 👍 and sparkles ✨", True),
+    ("Plain text only :)", False),
+])
+def test_detects_emojis(text, detected):
+    suggestions = get_engagement_suggestions(text)
+    assert ("😊 Emojis detected - great for visual interest!" in suggestions) is detected